@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-import platform
-import shlex
+import sys
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
+from typing import ClassVar
 
 from rich.console import RenderableType
 from rich.text import Text
@@ -18,8 +19,7 @@ from textual.widgets import Static, Input
 from kupo._argparse import KupoArgParser, ParsingError
 from kupo._directory import Directory
 
-PLATFORM = platform.system()
-WINDOWS = PLATFORM == "Windows"
+WINDOWS = sys.platform == "win32"
 
 
 class CommandLine(Widget):
@@ -37,25 +37,31 @@ class CommandLine(Widget):
             id="command-line-container"
         )
 
+    def on_mount(self, event: events.Mount) -> None:
+        # These are looked up on every keystroke, so grab them once up front
+        self._reference = self.app.query_one("#command-reference", CommandReference)
+        self._prompt = self.query_one("#command-line-prompt", Static)
+        self._input = self.query_one("#command-line-input", Input)
+        self._current_dir = self.app.query_one("#current-dir", Directory)
+
     def watch_selection_count(self, new_count: int) -> None:
         selection_info = self.query_one("#selection-info", Static)
         selection_info.display = new_count > 0
         selection_info.update(f"{self.selection_count} files selected")
 
     def on_input_changed(self, event: Input.Changed) -> None:
-        reference = self.app.query_one("#command-reference", CommandReference)
-        if event.input == "":
-            reference.display = False
-            return
-
-        split = shlex.split(event.value, posix=not WINDOWS)
+        reference = self._reference
+        # We only need the command name here, and shlex is slow to run on
+        # every keystroke (and raises on a half-typed quoted argument).
+        # Command names never need quoting, so splitting on whitespace
+        # is enough. Full parsing waits until the command is submitted.
+        split = event.value.split(None, 1)
         if split:
-            command, args = split[0], split[1:]
+            command = split[0]
         else:
             reference.display = False
             return
 
-        print(f"command is {command!r}")
         if Command.is_valid_command(command):
             reference.display = True
             reference.command_name = command
@@ -67,41 +73,53 @@ class CommandLine(Widget):
         # # TODO: Add the command to our history (we could save to disk too)
         input = event.value
 
+        # Only needed once a command is actually submitted
+        import shlex
+
         args = shlex.split(input, posix=not WINDOWS)
         if not args:
             return
-        elif len(args) == 1:
-            command_name = args[0]
-        else:
-            command_name = args[0]
-            args = args[1:]
-
-        # # TODO We should look up the correct argument parser based on command,
-        # #  for now we'll just hardcode until there are more commands.
+        command_name, args = args[0], args[1:]
 
         command = Command.load_command(command_name)
         if not command:
             return
 
         command.run(cmd_line=self, args=args)
-        self.query_one("#command-line-input", Input).value = ""
-        self.app.query_one("#current-dir", Directory).refresh()
+        self._input.value = ""
+        self._current_dir.refresh()
 
     def on_descendant_focus(self, event: events.DescendantFocus) -> None:
-        self.query_one("#command-line-prompt").add_class("active-prompt")
+        self._prompt.add_class("active-prompt")
 
     def on_descendant_blur(self, event: events.DescendantBlur) -> None:
-        self.query_one("#command-line-prompt").remove_class("active-prompt")
+        self._prompt.remove_class("active-prompt")
 
     def action_cancel(self):
-        self.app.query_one("#current-dir").focus()
+        self._current_dir.focus()
 
     def watch_descendant_has_focus(self, value: bool) -> None:
         if not value:
-            self.app.query_one("#command-reference").display = False
+            self._reference.display = False
+
+
+def _path_arg_parser() -> KupoArgParser:
+    parser = KupoArgParser()
+    parser.add_argument("path", type=Path)
+    return parser
 
 
-@dataclass
+def _containing_dir(path: Path, current_path: Path) -> Path:
+    """Return the resolved directory containing `path`.
+
+    Usually `path` is directly inside `current_path`, which is already
+    resolved, so we can skip Path.resolve() (which stats every component).
+    """
+    parent = path.parent
+    return parent if parent == current_path else parent.resolve()
+
+
+@dataclass(frozen=True, slots=True)
 class Command:
     command: str = ""
     syntax: str = ""
@@ -115,25 +133,20 @@ class Command:
     def is_valid_command(cls, command: str) -> bool:
         return command in _COMMANDS
 
-    @property
-    def arg_parser(self) -> KupoArgParser:
-        return KupoArgParser()
+    # Parsers don't change once configured, so each command builds one up front
+    arg_parser: ClassVar[KupoArgParser] = KupoArgParser()
 
     def run(self, cmd_line: CommandLine, args: list[str]) -> None:
         raise NotImplementedError
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ChangeDirectory(Command):
     command: str = "cd"
     syntax: str = "[b]cd[/] [i]PATH[/]"
     description: str = "Go to the directory at [i]PATH[/]."
 
-    @property
-    def arg_parser(self) -> KupoArgParser:
-        parser = KupoArgParser()
-        parser.add_argument("path", type=Path)
-        return parser
+    arg_parser: ClassVar[KupoArgParser] = _path_arg_parser()
 
     def run(self, cmd_line: CommandLine, args: list[str]) -> None:
         parser = self.arg_parser
@@ -142,7 +155,7 @@ class ChangeDirectory(Command):
             parsed_args = parser.parse_args(args)
         except ParsingError:
             # TODO: indicate error somehow
-            print("WOOPS, couldn't parse that.")
+            cmd_line.log.warning("couldn't parse arguments", args)
             return
 
         path = parsed_args.path
@@ -161,17 +174,13 @@ class ChangeDirectory(Command):
             )
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class MakeDirectory(Command):
     command: str = "mkdir"
     syntax: str = "[b]mkdir[/] [i]PATH[/]"
     description: str = "Create a directory at PATH"
 
-    @property
-    def arg_parser(self) -> KupoArgParser:
-        parser = KupoArgParser()
-        parser.add_argument("path", type=Path)
-        return parser
+    arg_parser: ClassVar[KupoArgParser] = _path_arg_parser()
 
     def run(self, cmd_line: CommandLine, args: list[str]) -> None:
         parser = self.arg_parser
@@ -180,7 +189,7 @@ class MakeDirectory(Command):
             parsed_args = parser.parse_args(args)
         except ParsingError:
             # TODO: indicate error somehow
-            print("WOOPS, couldn't parse that.")
+            cmd_line.log.warning("couldn't parse arguments", args)
             return
 
         path = parsed_args.path
@@ -193,7 +202,7 @@ class MakeDirectory(Command):
         new_path = current_path.joinpath(path)
         # TODO: Generic means of confirmation.
         Path.mkdir(new_path)
-        current_dir.update_source_directory(new_path.parent.resolve())
+        current_dir.update_source_directory(_containing_dir(new_path, current_path))
 
         # TODO: When we add support for parent=True, we'll need to ensure
         #  we pass the first part of the path arg to select_path, not the full
@@ -202,7 +211,7 @@ class MakeDirectory(Command):
         current_dir.focus()
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Quit(Command):
     command: str = "quit"
     syntax: str = "[b]quit[/]"
@@ -212,17 +221,13 @@ class Quit(Command):
         cmd_line.app.exit()
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Touch(Command):
     command: str = "touch"
     syntax: str = "[b]touch[/] PATH"
     description: str = "Create an empty file at PATH."
 
-    @property
-    def arg_parser(self) -> KupoArgParser:
-        parser = KupoArgParser()
-        parser.add_argument("path", type=Path)
-        return parser
+    arg_parser: ClassVar[KupoArgParser] = _path_arg_parser()
 
     def run(self, cmd_line: CommandLine, args: list[str]) -> None:
         parser = self.arg_parser
@@ -230,7 +235,10 @@ class Touch(Command):
             parsed_args = parser.parse_args(args)
         except ParsingError:
             # TODO: indicate error somehow
-            print("WOOPS, couldn't parse that.")
+            cmd_line.log.warning("couldn't parse arguments", args)
+            return
+
+        if not parsed_args.path:
             return
 
         current_dir = cmd_line.app.query_one("#current-dir", Directory)
@@ -240,17 +248,20 @@ class Touch(Command):
         given_path = current_path.joinpath(given_path)
         Path.touch(given_path)
 
-        current_dir.update_source_directory(given_path.parent.resolve())
+        current_dir.update_source_directory(
+            _containing_dir(given_path, current_path)
+        )
 
         current_dir.select_path(given_path)
         current_dir.focus()
 
 # TODO: __init_subclass__ is probably better than manually maintaining this:
+_QUIT = Quit()
 _COMMANDS: dict[str, Command] = {
     "cd": ChangeDirectory(),
     "mkdir": MakeDirectory(),
-    "q": Quit(),
-    "quit": Quit(),
+    "q": _QUIT,
+    "quit": _QUIT,
     "touch": Touch(),
 }
 
@@ -259,15 +270,18 @@ class CommandReference(Widget):
     command_name = reactive("", layout=True)
 
     def render(self) -> RenderableType:
-        print(f"getting {self.command_name}")
         info = _COMMANDS.get(self.command_name, None)
-        print(info)
         if not info:
             return ""
 
-        print(info.syntax)
-        return Text.assemble(
-            Text.from_markup(info.syntax),
-            (" ╲ ", "green"),
-            Text.from_markup(info.description),
-        )
+        return _reference_text(info)
+
+
+@lru_cache(maxsize=None)
+def _reference_text(command: Command) -> Text:
+    """The syntax and description of a command, parsed from markup on first use."""
+    return Text.assemble(
+        Text.from_markup(command.syntax),
+        (" ╲ ", "green"),
+        Text.from_markup(command.description),
+    )
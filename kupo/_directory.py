@@ -2,41 +2,110 @@ from __future__ import annotations
 
 import os
 import re
-from dataclasses import dataclass, field
+from dataclasses import dataclass
+from functools import lru_cache, partial
 from pathlib import Path
 from subprocess import call
 
 from rich.align import Align
 from rich.console import RenderableType, RenderResult, Console, ConsoleOptions
-from rich.markup import escape
+from rich.segment import Segment
 from rich.style import Style
-from rich.table import Table
 from rich.text import Text
 from textual import events
 from textual.binding import Binding
-from textual.dom import DOMNode
 from textual.geometry import clamp, Size, Region
 from textual.message import Message
 from textual.reactive import reactive
 from textual.widget import Widget
 
 from kupo._directory_search import DirectorySearch
-from kupo._files import convert_size, list_files_in_dir, _count_files, rm_tree
+from kupo._files import (
+    FileEntry,
+    Listing,
+    directory_mtime_ns,
+    read_listing,
+    rm_tree,
+)
+
+
+def _compile_filter(filter: str) -> re.Pattern[str]:
+    """Compile the filter typed by the user.
+
+    Half-typed filters are often invalid regular expressions (e.g. "foo("),
+    so those are matched literally rather than raising."""
+    try:
+        return re.compile(filter)
+    except re.error:
+        return re.compile(re.escape(filter))
+
+
+@lru_cache(maxsize=1024)
+def _parse_meta(meta_value: str) -> Text:
+    """Parse the markup of a meta column value.
+
+    Listings have a handful of distinct values (file counts, sizes), so each is
+    only parsed once. Callers must copy the result before changing it."""
+    return Text.from_markup(meta_value)
+
+
+# Rendered listing rows: (index, selected, chosen) -> (width, line of segments)
+RowCache = dict[tuple[int, bool, bool], tuple[int, list[Segment]]]
+
+
+# The placeholder messages never change, so their markup is only parsed once
+_EMPTY_DIRECTORY_TEXT = Text.from_markup("[dim]─ Empty directory ─[/]")
+_LOADING_TEXT = Text.from_markup("[dim]─ Loading ─[/]")
 
 
 class EmptyDirectoryRenderable:
     def __rich_console__(
         self, console: Console, options: ConsoleOptions
     ) -> RenderResult:
-        yield Align.center(Text.from_markup("[dim]─ Empty directory ─[/]"))
+        yield Align.center(_EMPTY_DIRECTORY_TEXT)
+
+
+class LoadingDirectoryRenderable:
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        yield Align.center(_LOADING_TEXT)
 
 
 class DirectoryListRenderable:
+    # Rows rendered either side of the viewport, so small scrolls don't show
+    # unrendered rows before the next refresh arrives.
+    OVERSCAN = 20
+    # Width of the meta (size/file count) column
+    META_WIDTH = 8
+
+    # One of these is created for every render
+    __slots__ = (
+        "files",
+        "selected_index",
+        "filter_re",
+        "scroll_y",
+        "viewport_height",
+        "dir_style",
+        "highlight_style",
+        "highlight_dir_style",
+        "meta_column_style",
+        "highlight_meta_column_style",
+        "chosen_path_style",
+        "chosen_path_meta_style",
+        "chosen_path_selected_style",
+        "chosen_path_selected_meta_style",
+        "chosen_paths",
+        "row_cache",
+    )
+
     def __init__(
         self,
-        files: list[Path],
+        files: list[FileEntry],
         selected_index: int | None,
-        filter: str = "",
+        filter_re: re.Pattern[str] | None = None,
+        scroll_y: int = 0,
+        viewport_height: int | None = None,
         dir_style: Style | None = None,
         highlight_style: Style | None = None,
         highlight_dir_style: Style | None = None,
@@ -47,10 +116,24 @@ class DirectoryListRenderable:
         chosen_path_selected_style: Style | None = None,
         chosen_path_selected_meta_style: Style | None = None,
         chosen_paths: set[Path] | None = None,
+        row_cache: RowCache | None = None,
     ) -> None:
+        """
+        Args:
+            files: The entries to list. These should already be narrowed down
+                to those matching the filter.
+            filter_re: The filter, used to highlight the matching part of
+                each name.
+            row_cache: If supplied, rendered rows are stored in and reused
+                from here, keyed on (index, selected, chosen), along with the
+                width they were rendered at. The owner must clear it whenever
+                the files, filter or styles change.
+        """
         self.files = files
         self.selected_index = selected_index
-        self.filter = filter
+        self.filter_re = filter_re
+        self.scroll_y = scroll_y
+        self.viewport_height = viewport_height
         self.dir_style = dir_style
         self.highlight_style = highlight_style
         self.highlight_dir_style = highlight_dir_style
@@ -61,6 +144,7 @@ class DirectoryListRenderable:
         self.chosen_path_selected_style = chosen_path_selected_style
         self.chosen_path_selected_meta_style = chosen_path_selected_meta_style
         self.chosen_paths = chosen_paths
+        self.row_cache = row_cache
 
     def __rich_console__(
         self, console: Console, options: ConsoleOptions
@@ -68,59 +152,100 @@ class DirectoryListRenderable:
         if not self.files:
             yield EmptyDirectoryRenderable()
 
-        table = Table.grid(expand=True)
-        table.add_column()
-        table.add_column(justify="right", max_width=8)
-
-        for index, file in enumerate(self.files):
-            is_dir = file.is_dir()
-            if not self.filter or (self.filter and re.search(self.filter, file.name)):
-
-                if index == self.selected_index:
-                    meta_style = self.highlight_meta_column_style
-                    if is_dir:
-                        style = self.highlight_dir_style or "bold red on #1E90FF"
-                    else:
-                        style = self.highlight_style or "bold red on #1E90FF"
-                else:
-                    meta_style = self.meta_column_style
-                    if is_dir:
-                        style = self.dir_style
-                    else:
-                        style = Style.null()
-
-                if isinstance(style, str):
-                    style = Style.parse(style)
-
-                if self.chosen_paths and file in self.chosen_paths:
-                    style += self.chosen_path_style
-                    meta_style += self.chosen_path_meta_style
-                    if index == self.selected_index:
-                        style += self.chosen_path_selected_style
-                        meta_style += self.chosen_path_selected_meta_style
-
-                file_name = escape(file.name)
-                if is_dir:
-                    file_name += "/"
-                    meta_value = str(_count_files(file) or "?")
-                    meta_style += Style(dim=True)
-                else:
-                    try:
-                        meta_value = convert_size(file.stat().st_size)
-                    except FileNotFoundError:
-                        meta_value = "[dim]?"
-
-                file_name = Text(file_name, style=style)
-                if file_name.plain.startswith(".") and index != self.selected_index:
-                    file_name.stylize(Style(dim=True))
-                if self.filter:
-                    file_name.highlight_regex(self.filter, "#191004 on #FEA62B")
-
-                table.add_row(
-                    file_name,
-                    Text.from_markup(meta_value, style=meta_style),
-                )
-        yield table
+        # Only rows in (or near) the viewport are built. Rows above it are
+        # blank lines, which keeps each row on the line matching its index.
+        start = 0
+        end = len(self.files)
+        if self.viewport_height is not None:
+            start = max(0, self.scroll_y - self.OVERSCAN)
+            end = min(end, self.scroll_y + self.viewport_height + self.OVERSCAN)
+            if start:
+                yield Segment("\n" * start)
+
+        # The layout is always a name column filling the width and a
+        # fixed-width, right-aligned meta column, so rather than have a Table
+        # measure every cell, we render each cell straight to a single line.
+        max_width = options.max_width
+        meta_width = min(self.META_WIDTH, max_width // 2)
+        name_options = options.update(
+            width=max_width - meta_width,
+            justify="left",
+            overflow="ellipsis",
+            no_wrap=True,
+            height=None,
+        )
+        meta_options = name_options.update(width=meta_width, justify="right")
+        render_lines = console.render_lines
+
+        def render_line(
+            file: FileEntry, selected: bool, chosen: bool
+        ) -> list[Segment]:
+            file_name, meta = self._render_row(file, selected, chosen)
+            line = render_lines(file_name, name_options, pad=True)[0]
+            if meta_width:
+                line += render_lines(meta, meta_options, pad=True)[0]
+            line.append(new_line)
+            return line
+
+        new_line = Segment.line()
+        chosen_paths = self.chosen_paths
+        row_cache = self.row_cache
+        for index in range(start, end):
+            file = self.files[index]
+            selected = index == self.selected_index
+            chosen = bool(chosen_paths) and file.path in chosen_paths
+            if row_cache is None:
+                yield from render_line(file, selected, chosen)
+                continue
+            # Rows are only laid out again if they're new, their state has
+            # changed, or the width has.
+            key = (index, selected, chosen)
+            cached = row_cache.get(key)
+            if cached is None or cached[0] != max_width:
+                line = render_line(file, selected, chosen)
+                cached = row_cache[key] = (max_width, line)
+            yield from cached[1]
+
+    def _render_row(
+        self, file: FileEntry, selected: bool, chosen: bool
+    ) -> tuple[Text, Text]:
+        is_dir = file.is_dir
+        if selected:
+            meta_style = self.highlight_meta_column_style
+            if is_dir:
+                style = self.highlight_dir_style or "bold red on #1E90FF"
+            else:
+                style = self.highlight_style or "bold red on #1E90FF"
+        else:
+            meta_style = self.meta_column_style
+            if is_dir:
+                style = self.dir_style or Style.null()
+            else:
+                style = Style.null()
+
+        if isinstance(style, str):
+            style = Style.parse(style)
+
+        if chosen:
+            style += self.chosen_path_style
+            meta_style += self.chosen_path_meta_style
+            if selected:
+                style += self.chosen_path_selected_style
+                meta_style += self.chosen_path_selected_meta_style
+
+        if is_dir:
+            meta_style += Style(dim=True)
+        if file.is_hidden and not selected:
+            style += Style(dim=True)
+
+        # Text doesn't parse markup, so the name is used verbatim
+        file_name = Text(file.display_name, style=style)
+        if self.filter_re is not None:
+            file_name.highlight_regex(self.filter_re, "#191004 on #FEA62B")
+
+        meta = _parse_meta(file.meta_value).copy()
+        meta.style = meta_style
+        return file_name, meta
 
 
 class Directory(Widget, can_focus=True):
@@ -148,7 +273,9 @@ class Directory(Widget, can_focus=True):
         Binding("D", "delete_selected", "Delete selected", key_display="D"),
     ]
 
-    filter = reactive("")
+    # The listing is loaded on mount, so there's no need to reload it for
+    # the initial filter too.
+    filter = reactive("", init=False)
 
     def __init__(
         self,
@@ -167,10 +294,20 @@ class Directory(Widget, can_focus=True):
         """
         super().__init__(name=name, id=id, classes=classes)
         self.path = path or Path.cwd()
-        self._files = list_files_in_dir(self.path)
+        # Listed in a worker once we're mounted, so a slow filesystem doesn't
+        # hold up the rest of the app.
+        # Everything in the directory, and the entries matching the filter
+        self._listing: list[FileEntry] = []
+        self._listing_mtime_ns: int | None = None
+        self._files: list[FileEntry] = []
+        self._loading = True
+        self._load_generation = 0
+        self._pending_selection: Path | None = None
         self.directory_search = directory_search
         self.cursor_movement_enabled = cursor_movement_enabled
         self.chosen_paths: set[Path] = set()
+        self._filter_re: re.Pattern[str] | None = None
+        self._row_cache: RowCache = {}
 
     def key_up(self, event: events.Key) -> None:
         event.stop()
@@ -183,8 +320,17 @@ class Directory(Widget, can_focus=True):
         self.action_next_file()
 
     def _on_mount(self, event: events.Mount) -> None:
-        # This is in place to trigger the FilePreviewChanged
+        self._filter_warning = self.app.query_one("#current-dir-filter-warning")
+        # Nothing's listed yet, so this just starts the selection off. The
+        # FilePreviewChanged is posted once the listing arrives.
         self.selected_index = 0
+        # We only render the rows in view, so scrolling our container
+        # means there are new rows to render.
+        self.watch(self.parent, "scroll_y", self._parent_scrolled, init=False)
+        self._load_files()
+
+    def _parent_scrolled(self) -> None:
+        self.refresh()
 
     @property
     def selected_index(self):
@@ -198,7 +344,10 @@ class Directory(Widget, can_focus=True):
             if self._files:
                 selected_file = self._files[self._selected_index]
                 self.post_message(
-                    Directory.FilePreviewChanged(selected_file, directory=self))
+                    Directory.FilePreviewChanged(
+                        selected_file.path, directory=self, entry=selected_file
+                    )
+                )
         # If we're scrolled such that the selected index is not on screen.
         # That is, if the selected index does not lie between scroll_y and scroll_y+content_region.height,
         # Then update the scrolling
@@ -222,8 +371,7 @@ class Directory(Widget, can_focus=True):
     def action_clear_filter(self):
         if self.directory_search.input.value:
             self.directory_search.input.value = ""
-            warning_banner = self.app.query_one("#current-dir-filter-warning")
-            warning_banner.display = False
+            self._filter_warning.display = False
         self.chosen_paths.clear()
         self.refresh()
         self._emit_secondary_selection_changed()
@@ -238,19 +386,19 @@ class Directory(Widget, can_focus=True):
         self.goto_selected_path()
 
     def goto_selected_path(self):
-        if not self.current_highlighted_path:
+        entry = self.current_highlighted_entry
+        if not entry:
             return
-        if self.current_highlighted_path.is_dir():
+        # The listing already knows whether this is a directory
+        if entry.is_dir:
             self.chosen_paths.clear()
             self.post_message(
-                Directory.CurrentDirChanged(
-                    new_dir=self.current_highlighted_path, from_dir=None
-                )
+                Directory.CurrentDirChanged(new_dir=entry.path, from_dir=None)
             )
-        elif self.current_highlighted_path.is_file():
+        elif entry.path.is_file():
             editor = os.environ.get('EDITOR', 'vim')
             with self.app.suspend():
-                edit_path = self.current_highlighted_path.resolve().absolute()
+                edit_path = entry.path.resolve().absolute()
                 call([editor, str(edit_path)])
             self.post_message(Directory.FilePreviewChanged(edit_path, directory=self))
 
@@ -271,10 +419,11 @@ class Directory(Widget, can_focus=True):
         self._emit_secondary_selection_changed()
 
     def action_delete_selected(self):
-        print(f"removing selected files {self.chosen_paths}")
+        self.log("removing selected files", self.chosen_paths)
         chosen_paths = self.chosen_paths.copy()
         for path in chosen_paths:
-            if path.is_file():
+            # A link is removed itself, even when it points to a directory
+            if path.is_symlink() or not path.is_dir():
                 os.remove(path)
             else:
                 rm_tree(path)
@@ -303,47 +452,158 @@ class Directory(Widget, can_focus=True):
         return clamp(new_index, 0, len(self._files) - 1)
 
     def watch_filter(self, new_filter: str):
-        self._files = [file for file in list_files_in_dir(self.path) if
-                       re.match(new_filter, file.name)]
+        # Compile once per filter change, rather than once per file per render
+        self._filter_re = _compile_filter(new_filter) if new_filter else None
+        # Rows highlight the filter match, so none of the cached ones apply
+        self._row_cache.clear()
+        if self._loading:
+            # The filter is applied once the listing arrives
+            return
+        self._files = self._filtered_listing()
         self.selected_index = 0 if self._files else None
 
+    def _filtered_listing(self) -> list[FileEntry]:
+        """The directory listing narrowed down to the entries matching the
+        filter. This is done once per filter change, so rendering only has to
+        slice the visible window out of the result."""
+        filter_re = self._filter_re
+        if filter_re is None:
+            return self._listing
+        filter = self.filter
+        if filter_re.pattern == re.escape(filter):
+            # The filter has no special characters (or was invalid, and so
+            # is matched literally), so it's just a prefix of the name.
+            # str.startswith checks that without going through the regex
+            # engine for every file.
+            return [file for file in self._listing if file.name.startswith(filter)]
+        match = filter_re.match
+        return [file for file in self._listing if match(file.name)]
+
+    def _load_files(self, listing: Listing | None = None) -> None:
+        """List the directory in a worker thread.
+
+        The current listing stays on screen until the new one is ready, at
+        which point the pending selection (or else the first entry) is selected.
+
+        If we've been handed a `listing` of the directory already, it's shown
+        straight away. It may have been listed a while ago though, so the
+        worker still checks the directory, and lists it again if it's changed
+        since (keeping the selection where it is).
+        """
+        self._loading = True
+        self._load_generation += 1
+        known_mtime_ns = None
+        if listing is not None:
+            # Goes through the same message as a listing from the worker, so
+            # a select_path() straight after this still waits for it.
+            self.post_message(Directory.ListingLoaded(listing, self._load_generation))
+            known_mtime_ns = listing.mtime_ns
+        self.run_worker(
+            partial(self._list_files, self.path, self._load_generation, known_mtime_ns),
+            thread=True,
+            exclusive=True,
+            group="listing",
+        )
+
+    def _list_files(
+        self, path: Path, generation: int, known_mtime_ns: int | None = None
+    ) -> None:
+        # Runs in the worker thread
+        if known_mtime_ns is not None and directory_mtime_ns(path) == known_mtime_ns:
+            # The listing we were handed is still current
+            return
+        self.post_message(Directory.ListingLoaded(read_listing(path), generation))
+
+    def _on_directory_listing_loaded(self, event: Directory.ListingLoaded) -> None:
+        if event.generation != self._load_generation:
+            # The directory changed again while this was listed
+            return
+        if self._loading:
+            self._loading = False
+            selection, self._pending_selection = self._pending_selection, None
+        else:
+            # A fresh listing of a directory we were handed an out of date
+            # listing for (see _load_files), so stay on the same file
+            selection = self.current_highlighted_path
+        self._listing = event.listing.files
+        self._listing_mtime_ns = event.listing.mtime_ns
+        self._files = self._filtered_listing()
+        self._row_cache.clear()
+        self.select_path(selection)
+
     @property
-    def current_highlighted_path(self):
+    def current_highlighted_entry(self) -> FileEntry | None:
         if not self._files:
             return None
         return self._files[self.selected_index]
 
-    def update_source_directory(self, new_path: Path | None) -> None:
+    @property
+    def current_highlighted_path(self) -> Path | None:
+        entry = self.current_highlighted_entry
+        return entry.path if entry else None
+
+    @property
+    def listing(self) -> Listing | None:
+        """Everything in the directory (ignoring the filter), or None if it's
+        still being listed."""
+        if self._loading:
+            return None
+        return Listing(self._listing, self._listing_mtime_ns)
+
+    def update_source_directory(
+        self, new_path: Path | None, listing: Listing | None = None
+    ) -> None:
+        """Show the contents of `new_path`, or just return to the top of the
+        current listing if it's None. The new contents are listed in the
+        background (see `_load_files`), unless `listing` already holds them."""
         if new_path is not None:
             self.path = new_path
-            self._files = list_files_in_dir(new_path)
-        self.selected_index = 0 if len(self._files) > 0 else None
+            self._load_files(listing)
+        else:
+            self.selected_index = 0 if len(self._files) > 0 else None
+
+    def notify_style_update(self) -> None:
+        super().notify_style_update()
+        # Cached rows have the old component styles baked in
+        self._row_cache.clear()
 
     def get_content_height(self, container: Size, viewport: Size, width: int) -> int:
         return max(len(self._files), container.height)
 
     def on_focus(self, event: events.Focus) -> None:
-        search_input = self.app.query_one("#directory-search-input")
-        if search_input.value != "":
-            warning_banner = self.app.query_one("#current-dir-filter-warning")
-            warning_banner.display = True
+        if self.directory_search.input.value != "":
+            self._filter_warning.display = True
 
     def on_blur(self, event: events.Blur):
-        warning_banner = self.app.query_one("#current-dir-filter-warning")
-        warning_banner.display = False
+        self._filter_warning.display = False
 
     def select_path(self, path: Path):
+        if self._loading:
+            # Selected once the listing we're waiting on arrives
+            self._pending_selection = path
+            return
+
         if path is None:
             self.selected_index = 0
             return
 
-        try:
-            index = self._files.index(path)
-        except ValueError:
-            index = 0
+        # Everything listed is directly inside self.path, so once the parent
+        # matches we only need to compare names (plain strings), rather than
+        # comparing a Path against every entry.
+        if path.parent != self.path:
+            self.selected_index = 0
+            return
+        name = path.name
+        index = next(
+            (index for index, file in enumerate(self._files) if file.name == name),
+            0,
+        )
         self.selected_index = index
 
     def render(self) -> RenderableType:
+        if self._loading and not self._files:
+            return LoadingDirectoryRenderable()
+
         dir_style = self.get_component_rich_style("directory--dir")
         highlight_style = self.get_component_rich_style("directory--highlighted")
         highlight_meta_column_style = self.get_component_rich_style(
@@ -361,10 +621,15 @@ class Directory(Widget, can_focus=True):
             "directory--chosen-path-selected")
         chosen_path_selected_meta_style = self.get_component_rich_style(
             "directory--chosen-path-selected-meta")
+        # The directory is always the first child of its container, so the
+        # container's scroll offset is also the first row in view.
+        container = self.parent
         return DirectoryListRenderable(
             files=self._files,
             selected_index=self.selected_index,
-            filter=self.filter,
+            filter_re=self._filter_re,
+            scroll_y=round(container.scroll_y),
+            viewport_height=container.size.height,
             dir_style=dir_style,
             highlight_style=highlight_style,
             highlight_dir_style=highlight_dir_style,
@@ -375,6 +640,7 @@ class Directory(Widget, can_focus=True):
             chosen_path_selected_style=chosen_path_selected_style,
             chosen_path_selected_meta_style=chosen_path_selected_meta_style,
             chosen_paths=self.chosen_paths,
+            row_cache=self._row_cache,
         )
 
     @dataclass
@@ -391,15 +657,26 @@ class Directory(Widget, can_focus=True):
 
     @dataclass
     class FilePreviewChanged(Message, bubble=True):
-        """Should be sent to the app when the selected file is changed."""
+        """Should be sent to the app when the selected file is changed.
+
+        The listing entry for the file is included when there is one, so
+        that what kind of file it is needn't be looked up again."""
         path: Path
         directory: Directory
+        entry: FileEntry | None = None
 
         @property
         def control(self) -> Widget | None:
             return self.directory
 
 
+    @dataclass
+    class ListingLoaded(Message, bubble=False):
+        """Posted (from a worker thread) to the directory itself, when the
+        listing it asked for is ready."""
+        listing: Listing
+        generation: int
+
     @dataclass
     class SecondarySelectionChanged(Message, bubble=True):
         """Should be sent to the app when the secondary selection is changed."""
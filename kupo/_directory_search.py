@@ -19,12 +19,12 @@ class DirectorySearch(Widget):
     def on_mount(self, event: events.Mount) -> None:
         from ._directory import Directory
         self.current_dir = self.app.query_one("#current-dir", Directory)
+        self.filter_warning = self.app.query_one("#current-dir-filter-warning")
 
     @on(Input.Changed, "#directory-search-input")
     def filter_value_changed(self, event: Input.Changed) -> None:
         self.current_dir.filter = event.value
-        warning_banner = self.app.query_one("#current-dir-filter-warning")
-        warning_banner.display = False
+        self.filter_warning.display = False
 
     def action_hide_search(self):
         self.display = False
@@ -40,6 +40,5 @@ class DirectorySearch(Widget):
         self.current_dir.goto_selected_path()
 
     def focus(self, scroll_visible: bool = True) -> None:
-        self.query_one("#directory-search-input").focus()
-        warning_banner = self.app.query_one("#current-dir-filter-warning")
-        warning_banner.display = False
+        self.input.focus()
+        self.filter_warning.display = False
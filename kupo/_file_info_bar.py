@@ -3,6 +3,7 @@ from __future__ import annotations
 import shutil
 import stat
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
 from rich.console import RenderableType
@@ -14,6 +15,76 @@ from textual.widget import Widget
 from kupo._files import convert_size
 
 
+# Each permission character (after the file type), and its style when it's set
+_PERMISSION_STYLES = (("r", "yellow b"), ("w", "red b"), ("x", "green b")) * 3
+
+
+@lru_cache(maxsize=None)
+def _permissions_text(perm_string: str) -> Text:
+    """Style a permission string such as "-rwxr-xr-x".
+
+    There are only a few dozen permission strings seen in practice, so each is
+    styled once."""
+    return Text.assemble(
+        (perm_string[0], "b dim"),
+        *(
+            (char, style if char == granted else "dim")
+            for char, (granted, style) in zip(perm_string[1:], _PERMISSION_STYLES)
+        ),
+    )
+
+
+@lru_cache(maxsize=512)
+def _user_name(uid: int) -> str:
+    """The name of the user with this ID. Looking a user up can go over the
+    network (e.g. with LDAP), so each ID is only looked up once."""
+    import pwd
+
+    try:
+        return pwd.getpwuid(uid).pw_name
+    except KeyError:
+        return str(uid)
+
+
+@lru_cache(maxsize=512)
+def _group_name(gid: int) -> str:
+    """The name of the group with this ID, looked up once per ID."""
+    import grp
+
+    try:
+        return grp.getgrgid(gid).gr_name
+    except KeyError:
+        return str(gid)
+
+
+@lru_cache(maxsize=256)
+def _file_info_text(mode: int, size: int, mtime: float, uid: int, gid: int) -> Text:
+    """The info bar contents for a file with this stat information.
+
+    Moving back and forth over the same files shows the same info again, so
+    it's cached on everything that's shown."""
+    assembled = [
+        _permissions_text(stat.filemode(mode)),
+        (" ╲ ", "dim cyan"),
+    ]
+
+    if stat.S_ISREG(mode):
+        assembled += [
+            Text.from_markup(convert_size(size)),
+            (" ╲ ", "dim cyan"),
+        ]
+
+    assembled += [
+        datetime.fromtimestamp(mtime).strftime("%-d %b %y %H:%M"),
+        (" ╲ ", "dim cyan"),
+        _user_name(uid),
+        (" ╲ ", "dim cyan"),
+        _group_name(gid),
+    ]
+
+    return Text.assemble(*assembled)
+
+
 class CurrentFileInfoBar(Widget):
     file: Path | None = reactive(None)
 
@@ -24,49 +95,15 @@ class CurrentFileInfoBar(Widget):
             self.display = True
 
     def render(self) -> RenderableType:
-        file = self.file
-        file_stat = file.stat()
-        modify_time = datetime.fromtimestamp(file_stat.st_mtime).strftime(
-            "%-d %b %y %H:%M")
-        perm_string = stat.filemode(file_stat.st_mode)
-        perm_string = Text.assemble(
-            (perm_string[0], "b dim"),
-            (perm_string[1],
-             f"yellow b" if perm_string[1] == "r" else "dim"),
-            (perm_string[2],
-             f"red b" if perm_string[2] == "w" else "dim"),
-            (perm_string[3],
-             f"green b" if perm_string[3] == "x" else "dim"),
-            (perm_string[4], "yellow b" if perm_string[4] == "r" else "dim"),
-            (perm_string[5], "red b" if perm_string[5] == "w" else "dim"),
-            (perm_string[6], "green b" if perm_string[6] == "x" else "dim"),
-            (perm_string[7],
-             f"b yellow" if perm_string[7] == "r" else "dim"),
-            (perm_string[8],
-             f"b red" if perm_string[8] == "w" else "dim"),
-            (perm_string[9],
-             f"b green" if perm_string[9] == "x" else "dim"),
+        # Everything shown here comes from this one stat
+        file_stat = self.file.stat()
+        return _file_info_text(
+            file_stat.st_mode,
+            file_stat.st_size,
+            file_stat.st_mtime,
+            file_stat.st_uid,
+            file_stat.st_gid,
         )
-        assembled = [
-            perm_string,
-            (" ╲ ", "dim cyan"),
-        ]
-
-        if file.is_file():
-            assembled += [
-                Text.from_markup(convert_size(file.stat().st_size)),
-                (" ╲ ", "dim cyan"),
-            ]
-
-        assembled += [
-            modify_time,
-            (" ╲ ", "dim cyan"),
-            file.owner(),
-            (" ╲ ", "dim cyan"),
-            file.group(),
-        ]
-
-        return Text.assemble(*assembled)
 
 
 class DiskUsageBar(Widget):
@@ -75,19 +112,36 @@ class DiskUsageBar(Widget):
     free = reactive(0)
     show_used = reactive(False)
 
+    # Disk usage changes slowly, so it's only checked this often (in seconds)
+    REFRESH_INTERVAL = 30
+
     def on_mount(self, event: events.Mount) -> None:
         self.update_stats()
+        self.set_interval(self.REFRESH_INTERVAL, self.update_stats)
 
     def on_click(self, event: events.Click) -> None:
         self.show_used = not self.show_used
 
     def update_stats(self):
+        # disk_usage can block for seconds on network filesystems, so it's
+        # read in a thread rather than holding up the UI.
+        self.run_worker(
+            self._read_disk_usage, thread=True, exclusive=True, group="disk-usage"
+        )
+
+    def _read_disk_usage(self) -> None:
         total, used, free = shutil.disk_usage("/")
+        self.app.call_from_thread(self._set_stats, total, used, free)
+
+    def _set_stats(self, total: int, used: int, free: int) -> None:
         self.total = total
         self.used = used
         self.free = free
 
     def render(self) -> RenderableType:
+        if not self.total:
+            # Still waiting on the first reading
+            return ""
         if self.show_used:
             return Text.from_markup(f"{convert_size(self.used)} [dim]used[/]")
         else:
@@ -1,47 +1,197 @@
 from __future__ import annotations
 
-import math
 import os
+import shutil
+from dataclasses import dataclass
+from functools import lru_cache
+from operator import attrgetter
 from pathlib import Path
 
 
+_SIZE_UNITS = ("B", "K", "M", "G", "T", "P", "E", "Z", "Y")
+
+
+# Sizes repeat a lot across a listing (empty files, block-sized files, copies)
+@lru_cache(maxsize=4096)
 def convert_size(size_bytes: int) -> str:
     if size_bytes == 0:
         return " 0[dim]B"
-    size_name = ("B", "K", "M", "G", "T", "P", "E", "Z", "Y")
-    index = int(math.floor(math.log(size_bytes, 1024)))
-    p = math.pow(1024, index)
-    number = round(size_bytes / p, 2)
-    unit = size_name[index]
+    # Each unit is 1024 (2**10) times the last, so the unit comes straight
+    # from the bit length, with no floating point logs (which can also land
+    # just under a whole number at exact powers of 1024).
+    index = min((size_bytes.bit_length() - 1) // 10, len(_SIZE_UNITS) - 1)
+    number = round(size_bytes / (1 << (10 * index)), 2)
+    unit = _SIZE_UNITS[index]
     return f"{number:.0f}[dim]{unit}[/]"
 
 
-def list_files_in_dir(dir: Path) -> list[Path]:
+@dataclass(slots=True)
+class FileEntry:
+    """An entry in a directory listing, along with the metadata gathered for
+    it while the directory was scanned.
+
+    Attributes:
+        name: The name of the file.
+        fspath: The full path to the file, as a string. The `path` property
+            gives it as a Path.
+        is_dir: True if the entry is a directory (or a link to one).
+        is_file: True if the entry is a regular file (or a link to one).
+        size: The size of the file in bytes, or None if it couldn't be
+            stat'd (e.g. it's a broken symlink).
+        mtime_ns: The modification time of the file in nanoseconds, or None
+            if it couldn't be stat'd.
+        meta_value: The markup shown in the meta column of a directory
+            listing: the number of entries for a directory, or the
+            human-readable size for a file.
+        display_name: The name as shown in a directory listing, with a
+            trailing slash on directories.
+        is_hidden: True if the file is a dotfile.
+    """
+    name: str
+    fspath: str
+    is_dir: bool
+    is_file: bool
+    size: int | None
+    mtime_ns: int | None
+    meta_value: str
+    display_name: str
+    is_hidden: bool
+
+    @property
+    def path(self) -> Path:
+        # Only a few entries (the selected or chosen ones) are ever needed as
+        # a Path, and building one for every entry in a listing costs more
+        # than the stat we make for it.
+        return Path(self.fspath)
+
+
+@dataclass(slots=True)
+class Listing:
+    """Everything in a directory, along with the directory's modification time
+    when it was listed. Adding, removing or renaming an entry bumps that time,
+    so a listing can be checked against it before it's reused.
+
+    Attributes:
+        files: The entries in the directory, sorted for display.
+        mtime_ns: The modification time of the directory in nanoseconds, or
+            None if it couldn't be stat'd (so it's never known to be current).
+    """
+    files: list[FileEntry]
+    mtime_ns: int | None
+
+
+def directory_mtime_ns(dir: Path) -> int | None:
+    try:
+        return os.stat(dir).st_mtime_ns
+    except OSError:
+        return None
+
+
+def read_listing(dir: Path) -> Listing:
+    # The time is taken before listing, so anything that changes while we
+    # list makes the listing look out of date, rather than current.
+    mtime_ns = directory_mtime_ns(dir)
+    return Listing(list_files_in_dir(dir), mtime_ns)
+
+
+def list_files_in_dir(dir: Path) -> list[FileEntry]:
     try:
-        files = sorted(list(dir.iterdir()), key=_directory_sorter)
+        with os.scandir(dir) as entries:
+            files = [_file_entry(entry) for entry in entries]
     except OSError:
+        # The directory itself couldn't be listed (_file_entry handles
+        # failures on any one entry)
         files = []
+    _sort_listing(files)
     return files
 
 
-def _directory_sorter(path: Path) -> tuple[bool, bool, str]:
-    name = path.name
-    return not path.is_dir(), not name.startswith("."), name
+def _file_entry(entry: os.DirEntry) -> FileEntry:
+    # DirEntry answers is_dir() from the directory listing itself where it
+    # can, so the only syscall we make per entry is the stat below.
+    try:
+        is_dir = entry.is_dir()
+        is_file = entry.is_file()
+    except OSError:
+        is_dir = is_file = False
+    try:
+        entry_stat = entry.stat()
+    except OSError:
+        size = mtime_ns = None
+    else:
+        size, mtime_ns = entry_stat.st_size, entry_stat.st_mtime_ns
+    fspath = entry.path
+    # Work out the meta column now, so that rendering needn't do any I/O
+    if is_dir:
+        meta_value = str(_count_files(fspath, mtime_ns) or "?")
+    elif size is not None:
+        meta_value = convert_size(size)
+    else:
+        meta_value = "[dim]?"
+    name = entry.name
+    display_name = f"{name}/" if is_dir else name
+    return FileEntry(
+        name,
+        fspath,
+        is_dir,
+        is_file,
+        size,
+        mtime_ns,
+        meta_value,
+        display_name,
+        name.startswith("."),
+    )
+
+
+_by_name = attrgetter("name")
+_by_is_hidden = attrgetter("is_hidden")
+_by_is_dir = attrgetter("is_dir")
+
+
+def _sort_listing(files: list[FileEntry]) -> None:
+    """Sort directories first, then dotfiles, then by name, in place.
 
+    Rather than calling a Python key function that builds a tuple for every
+    entry, this sorts by each attribute in turn, least significant first.
+    Sorting is stable (including with reverse=True), so each pass keeps the
+    order of the ones before it, and attrgetter keys never call back into
+    Python."""
+    files.sort(key=_by_name)
+    files.sort(key=_by_is_hidden, reverse=True)
+    files.sort(key=_by_is_dir, reverse=True)
 
-def _count_files(dir: Path) -> int | None:
+
+def _count_files(dir: Path | str, mtime_ns: int | None = None) -> int | None:
     """Return the number of files in a directory.
-    Return None if we can't (e.g. permission error)"""
+    Return None if we can't (e.g. permission error)
+
+    If the modification time of the directory is supplied, the count is
+    memoized against it - adding or removing an entry bumps the directory
+    mtime, so a stale count is never returned. Failures aren't memoized:
+    e.g. a chmod that makes the directory readable doesn't bump its mtime."""
+    # Any failure (not just permissions, but e.g. EIO, or the directory being
+    # removed while we list its parent) only loses this one count, rather
+    # than reaching list_files_in_dir and emptying the whole listing.
     try:
-        return len([1 for x in os.scandir(dir)])
-    except PermissionError:
+        if mtime_ns is None:
+            return _scan_count(dir)
+        return _count_files_cached(str(dir), mtime_ns)
+    except OSError:
         return None
 
 
+@lru_cache(maxsize=4096)
+def _count_files_cached(dir: str, mtime_ns: int) -> int:
+    # lru_cache doesn't store calls that raise, so only counts are cached
+    return _scan_count(dir)
+
+
+def _scan_count(dir: Path | str) -> int:
+    with os.scandir(dir) as entries:
+        return sum(1 for _ in entries)
+
+
 def rm_tree(pth: Path) -> None:
-    for child in pth.iterdir():
-        if child.is_file():
-            child.unlink()
-        else:
-            rm_tree(child)
-    pth.rmdir()
+    # shutil.rmtree walks the tree with scandir, and removes symlinks inside it
+    # rather than following them into whatever they point at.
+    shutil.rmtree(pth)
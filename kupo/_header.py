@@ -3,6 +3,8 @@ from __future__ import annotations
 import getpass
 import os
 import socket
+from functools import lru_cache
+from pathlib import Path
 
 from rich.console import RenderableType
 from rich.text import Text
@@ -13,24 +15,42 @@ from textual.widget import Widget
 
 class HeaderCurrentPath(Widget):
     path = reactive(None, layout=True)
+    _path_text: RenderableType = ""
+
+    def watch_path(self, new_path: Path | None) -> None:
+        # Build the text once per path change rather than on every render
+        if not new_path:
+            self._path_text = ""
+            return
+
+        path = str(new_path.name)
+        root = str(new_path.parent) + os.path.sep
+        self._path_text = Text.assemble((root, "dim"), (path, "bold"))
 
     def render(self) -> RenderableType:
-        if not self.path:
-            return ""
+        return self._path_text
+
+
+# The host and user don't change while we're running, so each is only looked
+# up once (on first render, rather than at import)
+@lru_cache(maxsize=None)
+def _host_markup() -> str:
+    return "[dim]@[/]" + socket.gethostname()
+
 
-        path = str(self.path.name)
-        root = str(self.path.parent) + os.path.sep
-        return Text.assemble((root, "dim"), (path, "bold"))
+@lru_cache(maxsize=None)
+def _user_name() -> str:
+    return getpass.getuser()
 
 
 class HeaderHost(Widget):
     def render(self) -> RenderableType:
-        return "[dim]@[/]" + socket.gethostname()
+        return _host_markup()
 
 
 class HeaderUser(Widget):
     def render(self) -> RenderableType:
-        return getpass.getuser()
+        return _user_name()
 
 
 class Header(Widget):
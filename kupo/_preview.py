@@ -1,13 +1,90 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
+from functools import lru_cache, partial
 from pathlib import Path
 
+from pygments.lexers import get_lexer_for_filename
+from pygments.util import ClassNotFound
+from rich.console import Console, ConsoleOptions, RenderableType, RenderResult
+from rich.measure import Measurement
+from rich.segment import Segment
 from rich.syntax import Syntax
 from textual.binding import Binding
+from textual.message import Message
 from textual.widgets import Static
 
 from kupo._directory import DirectoryListRenderable
-from kupo._files import list_files_in_dir
+from kupo._files import Listing, read_listing
+
+
+@lru_cache(maxsize=256)
+def _lexer_for_suffix(suffix: str) -> str | None:
+    """The name of the lexer for files ending in `suffix`, or None if there
+    isn't one.
+
+    Guessing from the file contents runs every candidate lexer's analysis, so
+    for known suffixes we go on the suffix alone, and only look it up once."""
+    try:
+        lexer = get_lexer_for_filename(f"x{suffix}")
+    except ClassNotFound:
+        return None
+    return lexer.aliases[0] if lexer.aliases else lexer.name
+
+
+class _CachedLines:
+    """Wraps a renderable, keeping the lines it renders to at each width.
+
+    Rendering a Syntax is where Pygments highlights the code, so by holding on
+    to one of these, showing the same file again doesn't re-highlight it."""
+
+    __slots__ = ("renderable", "_lines", "_measurements")
+
+    def __init__(self, renderable: RenderableType) -> None:
+        self.renderable = renderable
+        self._lines: dict[int, list[list[Segment]]] = {}
+        self._measurements: dict[int, Measurement] = {}
+
+    def __rich_measure__(
+        self, console: Console, options: ConsoleOptions
+    ) -> Measurement:
+        # The preview is sized to its content, so this runs on every layout.
+        # Syntax measures itself by splitting the code into lines each time,
+        # so that's only done once per width too.
+        width = options.max_width
+        measurement = self._measurements.get(width)
+        if measurement is None:
+            measurement = self._measurements[width] = Measurement.get(
+                console, options, self.renderable
+            )
+        return measurement
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        width = options.max_width
+        lines = self._lines.get(width)
+        if lines is None:
+            lines = self._lines[width] = console.render_lines(
+                self.renderable, options.update(height=None), pad=False
+            )
+        new_line = Segment.line()
+        for line in lines:
+            yield from line
+            yield new_line
+
+
+@lru_cache(maxsize=64)
+def _syntax_preview(text: str, lexer: str, background_colour: str) -> _CachedLines:
+    return _CachedLines(
+        Syntax(
+            text,
+            lexer,
+            background_color=background_colour,
+            line_numbers=True,
+            indent_guides=True,
+        )
+    )
 
 
 class Preview(Static, can_focus=True):
@@ -32,32 +109,68 @@ class Preview(Static, can_focus=True):
         classes: str | None = None,
     ):
         super().__init__(name=name, id=id, classes=classes)
-        self._content_height = None
-        self._content_width = None
+        # Bumped whenever we're asked to preview something, so a directory
+        # listing that finishes after the selection has moved on is dropped.
+        self._preview_generation = 0
+        # The directory being previewed, and its listing once it's arrived
+        self._listed_directory: tuple[Path, Listing] | None = None
 
     def show_syntax(self, text: str, path: Path) -> None:
-        lexer = Syntax.guess_lexer(str(path), text)
+        self._preview_generation += 1
+        self._listed_directory = None
+        lexer = path.suffix and _lexer_for_suffix(path.suffix)
+        if not lexer:
+            # e.g. Makefile, or an unknown suffix
+            lexer = Syntax.guess_lexer(str(path), text)
         background_colour = self.get_component_styles("preview--body").background.hex
-        self.update(
-            Syntax(
-                text,
-                lexer,
-                background_color=str(background_colour),
-                line_numbers=True,
-                indent_guides=True,
-            )
-        )
+        preview = _syntax_preview(text, lexer, str(background_colour))
+        # The same text comes back as the same cached preview, in which case
+        # there's nothing to lay out or repaint.
+        if preview is not self.renderable:
+            self.update(preview)
 
     def show_directory_preview(self, path: Path) -> None:
+        # This is called as the selection moves, and listing a directory (which
+        # counts what's in each of its subdirectories too) can be slow, so
+        # it's done in a worker thread.
+        self._preview_generation += 1
+        self._listed_directory = None
+        self.run_worker(
+            partial(self._list_directory, path, self._preview_generation),
+            thread=True,
+            exclusive=True,
+            group="directory-preview",
+        )
+
+    def _list_directory(self, path: Path, generation: int) -> None:
+        # Runs in the worker thread
+        listing = read_listing(path)
+        self.post_message(Preview.DirectoryListed(path, listing, generation))
+
+    def _on_preview_directory_listed(self, event: Preview.DirectoryListed) -> None:
+        if event.generation != self._preview_generation:
+            # Something else has been previewed since
+            return
+        self._listed_directory = (event.path, event.listing)
         directory_style = self.get_component_rich_style("directory--dir")
         directory = DirectoryListRenderable(
-            list_files_in_dir(path),
+            event.listing.files,
             selected_index=None,
             dir_style=directory_style,
             meta_column_style=self.get_component_rich_style("directory--meta-column"),
         )
         self.update(directory)
 
+    def listing_of(self, path: Path) -> Listing | None:
+        """The listing of `path` if it's the directory currently previewed,
+        so that moving into it can show it straight away. None otherwise."""
+        listed = self._listed_directory
+        if listed is not None and listed[0] == path:
+            # It carries the directory's mtime from when it was listed, so
+            # whoever's handed it can tell if it's gone out of date
+            return listed[1]
+        return None
+
     def action_up(self):
         self.parent.scroll_up(animate=False)
 
@@ -72,3 +185,11 @@ class Preview(Static, can_focus=True):
 
     def action_bottom(self):
         self.parent.scroll_end(animate=False)
+
+    @dataclass
+    class DirectoryListed(Message, bubble=False):
+        """Posted (from a worker thread) to the preview itself, when the
+        directory it's previewing has been listed."""
+        path: Path
+        listing: Listing
+        generation: int
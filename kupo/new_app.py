@@ -1,19 +1,20 @@
 from __future__ import annotations
 
 import asyncio
+import codecs
+import os
+import stat
 import sys
 from contextlib import contextmanager, redirect_stdout, redirect_stderr
 from pathlib import Path
 from typing import Iterator
 
-import aiofiles
-from rich.markdown import Markdown
 from textual import events, on
 from textual.app import App, ComposeResult
 from textual.binding import Binding
 from textual.containers import Horizontal, Container, VerticalScroll
 from textual.screen import Screen
-from textual.widgets import Static, Footer
+from textual.widgets import Static, Footer, Input
 
 from kupo._command_line import CommandLine, CommandReference
 from kupo._directory import Directory
@@ -23,6 +24,36 @@ from kupo._header import Header, HeaderCurrentPath
 from kupo._preview import Preview
 
 
+# How much of a file is read to preview it
+PREVIEW_BYTES = 2048
+
+
+def _read_preview(path: Path) -> str:
+    """Read the start of a file to preview it."""
+    # A bare descriptor skips what open() sets up for a buffered file object
+    # (an fstat for the buffer size, an isatty check), which we don't need for
+    # a single read. O_BINARY stops Windows translating newlines.
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        # TODO - if they start scrolling preview, load more than 2048 bytes.
+        data = os.read(fd, PREVIEW_BYTES)
+    finally:
+        os.close(fd)
+    # Decoding ourselves, rather than reading in text mode with the locale's
+    # encoding, means binary files preview (as replacement characters)
+    # instead of raising. Newlines are normalised as text mode would.
+    # A full read can end partway through a multibyte character. An
+    # incremental decoder holds that incomplete tail back (with final=False),
+    # rather than replacing it with a spurious U+FFFD. A short read is the
+    # whole file, so there's nothing to hold back.
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    return (
+        decoder.decode(data, final=len(data) < PREVIEW_BYTES)
+        .replace("\r\n", "\n")
+        .replace("\r", "\n")
+    )
+
+
 class Home(Screen):
     BINDINGS = [
         Binding("question_mark", "app.push_screen('help')", "Help"),
@@ -66,8 +97,18 @@ class Home(Screen):
         yield Footer()
 
     def on_mount(self, event: events.Mount) -> None:
-        self.query_one("#parent-dir", Directory).select_path(self._initial_cwd)
-        self.query_one("#current-dir").focus(scroll_visible=False)
+        # These are looked up every time the selection moves, so grab them
+        # once up front
+        self._current_dir = self.query_one("#current-dir", Directory)
+        self._parent_dir = self.query_one("#parent-dir", Directory)
+        self._preview = self.query_one("#preview", Preview)
+        self._file_info_bar = self.query_one(CurrentFileInfoBar)
+        self._header_path = self.query_one(HeaderCurrentPath)
+        self._search_input = self.query_one("#directory-search-input", Input)
+        self._command_line = self.query_one("#command-line", CommandLine)
+
+        self._parent_dir.select_path(self._initial_cwd)
+        self._current_dir.focus(scroll_visible=False)
 
     @on(Directory.FilePreviewChanged, "#current-dir")
     def update_file_preview(self, event: Directory.FilePreviewChanged):
@@ -77,18 +118,36 @@ class Home(Screen):
         # Ensure the message is coming from the correct directory widget
         # TODO: Could probably add a readonly flag to Directory to prevent having this check
         path = event.path
-        self.query_one(CurrentFileInfoBar).file = path
-        if path.is_file():
-            asyncio.create_task(self.show_syntax(path))
-        elif path.is_dir():
-            self.query_one("#preview", Preview).show_directory_preview(path)
-
-        self.query_one(HeaderCurrentPath).path = path
+        self._file_info_bar.file = path
+        entry = event.entry
+        if entry is not None:
+            # Already known from listing the directory
+            is_file, is_dir = entry.is_file, entry.is_dir
+        else:
+            # One stat tells us which kind of preview it is (is_file() and
+            # then is_dir() would stat every directory twice)
+            try:
+                mode = path.stat().st_mode
+            except OSError:
+                mode = 0
+            is_file, is_dir = stat.S_ISREG(mode), stat.S_ISDIR(mode)
+        # Moving quickly through files starts a read for each of them. Only
+        # the latest should reach the preview, so starting a new one cancels
+        # any still in flight (as does moving onto a directory).
+        if is_file:
+            self.run_worker(
+                self.show_syntax(path), exclusive=True, group="file-preview"
+            )
+        elif is_dir:
+            self.workers.cancel_group(self, "file-preview")
+            self._preview.show_directory_preview(path)
+
+        self._header_path.path = path
 
     @on(Directory.CurrentDirChanged)
     def new_directory_selected(self, event: Directory.CurrentDirChanged):
         # If we change directory, filters no longer apply
-        self.query_one("#directory-search-input").value = ""
+        self._search_input.value = ""
         new_dir = event.new_dir.resolve()
         from_dir = event.from_dir.resolve() if event.from_dir else None
         self._update_directory_and_parent_widgets(new_dir, from_dir)
@@ -96,23 +155,41 @@ class Home(Screen):
     def _update_directory_and_parent_widgets(
         self, new_dir: Path, from_dir: Path | None = None
     ) -> None:
-        directory_widget = self.query_one("#current-dir", Directory)
-        directory_widget.update_source_directory(new_dir)
+        directory_widget = self._current_dir
+        parent_directory_widget = self._parent_dir
+
+        # Stepping into or out of a directory, one side is already showing what
+        # the other is about to, so it's handed across rather than listed again.
+        # Stepping into the highlighted directory, the preview has listed it.
+        current_listing = (
+            parent_directory_widget.listing
+            if parent_directory_widget.path == new_dir
+            else self._preview.listing_of(new_dir)
+        )
+        parent_listing = (
+            directory_widget.listing
+            if directory_widget.path == new_dir.parent
+            else None
+        )
+
+        directory_widget.update_source_directory(new_dir, current_listing)
         directory_widget.select_path(from_dir)
 
-        parent_directory_widget = self.query_one("#parent-dir", Directory)
-        parent_directory_widget.update_source_directory(new_dir.parent)
+        parent_directory_widget.update_source_directory(new_dir.parent, parent_listing)
         parent_directory_widget.select_path(new_dir)
 
     async def show_syntax(self, path: Path) -> None:
-        async with aiofiles.open(path, mode="r") as f:
-            # TODO - if they start scrolling preview, load more than 2048 bytes.
-            contents = await f.read(2048)
-        self.query_one("#preview", Preview).show_syntax(contents, path)
+        # Opening and reading in one thread hop, rather than one each (as
+        # aiofiles does), since this happens every time a file is highlighted
+        try:
+            contents = await asyncio.to_thread(_read_preview, path)
+        except OSError:
+            # e.g. we can't read it, or it's gone since it was listed
+            return
+        self._preview.show_syntax(contents, path)
 
     def on_directory_secondary_selection_changed(self, event: Directory.SecondarySelectionChanged) -> None:
-        command_line = self.query_one("#command-line", CommandLine)
-        command_line.selection_count = len(event.selection)
+        self._command_line.selection_count = len(event.selection)
 
 
 class Help(Screen):
@@ -123,6 +200,10 @@ class Help(Screen):
     def compose(self) -> ComposeResult:
         help_path = Path(__file__).parent / "kupo_commands.md"
         help_text = help_path.read_text(encoding="utf-8")
+        # Markdown pulls in markdown-it and friends, which add noticeably to
+        # startup, so it's only imported once help is first shown.
+        from rich.markdown import Markdown
+
         rendered_help = Markdown(help_text)
         yield Static(rendered_help)
         yield Footer()
@@ -142,10 +223,16 @@ class Kupo(App):
     @contextmanager
     def suspend(self) -> Iterator[None]:
         driver = self._driver
-        if driver is not None:
-            driver.stop_application_mode()
+        if driver is None:
+            yield
+            return
+        driver.stop_application_mode()
+        try:
             with redirect_stdout(sys.__stdout__), redirect_stderr(sys.__stderr__):
                 yield
+        finally:
+            # Even if what we suspended for failed (e.g. $EDITOR isn't
+            # installed), we still need the terminal back
             driver.start_application_mode()
 
 
@@ -0,0 +1,12 @@
+from kupo._directory import _compile_filter
+
+
+def test_compile_filter_valid_pattern_is_a_regex():
+    assert _compile_filter("a.c").match("abc")
+
+
+def test_compile_filter_invalid_pattern_matches_literally():
+    filter_re = _compile_filter("foo(")
+    assert filter_re.pattern == r"foo\("
+    assert filter_re.match("foo(bar)")
+    assert not filter_re.match("foobar")
@@ -0,0 +1,63 @@
+import os
+from unittest import mock
+
+from kupo import _files
+from kupo._files import _count_files, directory_mtime_ns, read_listing
+
+
+def test_read_listing_lists_directories_first(tmp_path):
+    (tmp_path / "b.txt").write_text("hello")
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "inner").touch()
+
+    listing = read_listing(tmp_path)
+
+    assert [file.name for file in listing.files] == ["a", "b.txt"]
+    directory, file = listing.files
+    assert directory.is_dir and not directory.is_file
+    assert directory.meta_value == "1"
+    assert file.is_file and file.size == 5
+
+
+def test_read_listing_records_directory_mtime(tmp_path):
+    listing = read_listing(tmp_path)
+    assert listing.mtime_ns == directory_mtime_ns(tmp_path)
+
+
+def test_listing_goes_stale_when_an_entry_is_added(tmp_path):
+    listing = read_listing(tmp_path)
+    (tmp_path / "new.txt").touch()
+    # Force a different mtime, in case the filesystem's resolution is coarse
+    os.utime(tmp_path, ns=(listing.mtime_ns + 10**9, listing.mtime_ns + 10**9))
+
+    assert directory_mtime_ns(tmp_path) != listing.mtime_ns
+    assert [file.name for file in read_listing(tmp_path).files] == ["new.txt"]
+
+
+def test_read_listing_missing_directory(tmp_path):
+    listing = read_listing(tmp_path / "missing")
+    assert listing.files == []
+    assert listing.mtime_ns is None
+
+
+def test_count_files(tmp_path):
+    (tmp_path / "one").touch()
+    (tmp_path / "two").mkdir()
+
+    assert _count_files(tmp_path) == 2
+    assert _count_files(tmp_path, directory_mtime_ns(tmp_path)) == 2
+
+
+def test_count_files_unreadable_directory(tmp_path):
+    assert _count_files(tmp_path / "missing") is None
+
+
+def test_count_files_does_not_memoize_failures(tmp_path):
+    (tmp_path / "one").touch()
+    mtime_ns = directory_mtime_ns(tmp_path)
+
+    with mock.patch.object(_files.os, "scandir", side_effect=PermissionError):
+        assert _count_files(tmp_path, mtime_ns) is None
+
+    # Becoming readable doesn't change the mtime, but the count is found
+    assert _count_files(tmp_path, mtime_ns) == 1
@@ -0,0 +1,27 @@
+from kupo.new_app import PREVIEW_BYTES, _read_preview
+
+
+def test_read_preview_holds_back_character_split_at_cutoff(tmp_path):
+    # "é" is two bytes in UTF-8, so the cutoff falls in the middle of one
+    path = tmp_path / "split.txt"
+    path.write_bytes(b"a" + "é".encode() * PREVIEW_BYTES)
+
+    preview = _read_preview(path)
+
+    assert "\ufffd" not in preview
+    assert preview == "a" + "é" * ((PREVIEW_BYTES - 1) // 2)
+
+
+def test_read_preview_replaces_truncated_character_at_end_of_file(tmp_path):
+    # A short read is the whole file, so an incomplete tail is invalid
+    path = tmp_path / "truncated.txt"
+    path.write_bytes(b"abc" + "é".encode()[:1])
+
+    assert _read_preview(path) == "abc\ufffd"
+
+
+def test_read_preview_normalises_newlines(tmp_path):
+    path = tmp_path / "newlines.txt"
+    path.write_bytes(b"one\r\ntwo\rthree\n")
+
+    assert _read_preview(path) == "one\ntwo\nthree\n"